@@ -22,8 +22,12 @@ setup(
     install_requires=[
         "pyttsx3",
         "g4f",
-        "pygame",
+        "pyaudio",
     ],
+    extras_require={
+        "speedups": ["orjson", "isal"],
+        "onnx": ["onnxruntime", "piper-phonemize", "numpy"],
+    },
     classifiers=[
         "Intended Audience :: Developers",
         "Programming Language :: Python",
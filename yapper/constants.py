@@ -10,6 +10,22 @@ VOICE_FEMALE = "f"
 SPEECH_RATE = 165
 SPEECH_VOLUME = 1
 
+# 4096 frames is ~190ms at 22050Hz, large enough to avoid underruns and
+# frequent wakeups during playback while adding no audible delay.
+FRAMES_PER_BUFFER = 4096
+
+SPEECH_CACHE_BYTES = 64 * 1024 * 1024
+# a cache entry is written in one go, a '.part' file older than this was
+# left behind by a process that died while writing it
+SPEECH_CACHE_PART_AGE = 60 * 60
+
+# seconds of silence piper adds after each sentence
+SENTENCE_SILENCE = 0.2
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+PROGRESS_INTERVAL = 0.25
+MAX_REDIRECTS = 10
+
 FLD_ROLE = "role"
 FLD_CHOICES = "choices"
 FLD_MESSAGE = "message"
@@ -18,6 +34,7 @@ FLD_CONTENT = "content"
 GROQ_FLD_MESSAGES = "messages"
 GROQ_FLD_MODEL = "model"
 
+GEMINI_HOST = "generativelanguage.googleapis.com"
 GEMINI_FLD_SYS_INST = "system_instruction"
 GEMINI_FLD_PARTS = "parts"
 GEMINI_FLD_TEXT = "text"
@@ -1,16 +1,53 @@
 import json
+import threading
 from abc import ABC, abstractmethod
-from typing import Optional
-from urllib.request import Request, urlopen
-
-from g4f.client import Client
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional
 
 import yapper.constants as c
 from yapper.enums import GeminiModel, GroqModel, Persona
 
+if TYPE_CHECKING:
+    from http.client import HTTPSConnection
+
+    from g4f.client import Client
+
+PERSONA_ERROR = f"persona must be one of {', '.join(Persona)}"
+
+try:
+    from orjson import dumps as dump_json
+except ImportError:
+
+    def dump_json(data: dict) -> bytes:
+        """Serializes the given data into compact JSON bytes."""
+        return json.dumps(
+            data, separators=(",", ":"), ensure_ascii=False
+        ).encode("utf-8")
+
+
+def get_persona_instr(persona: Persona, persona_instr: Optional[str]) -> str:
+    """
+    Returns the given custom persona instruction, or the instruction of
+    the given persona if there is none.
+
+    Raises
+    ----------
+    ValueError
+        If no custom instruction is given and the persona is unknown.
+    """
+    if persona_instr is not None:
+        return persona_instr
+    # the lookup doubles as validation, non-strings can't be personas and
+    # may not even be hashable
+    if isinstance(persona, str):
+        instr = c.persona_instrs.get(persona)
+        if instr is not None:
+            return instr
+    raise ValueError(PERSONA_ERROR)
+
 
 def enhancer_gpt(
-    client: Client, model: str, persona_instr: str, text: str
+    client: "Client", model: str, persona_instr: str, text: str
 ) -> Optional[str]:
     """
     Enhances the given text using g4f (gpt for free).
@@ -38,7 +75,11 @@ def enhancer_gpt(
 
 
 def enhancer_gemini(
-    model: str, persona_instr: str, api_key: str, text: str
+    model: str,
+    persona_instr: str,
+    api_key: str,
+    text: str,
+    conn: Optional["HTTPSConnection"] = None,
 ) -> str:
     """
     Enhances the given text using Gemini.
@@ -53,9 +94,20 @@ def enhancer_gemini(
         The Gemini API key used for making request.
     query: str
         The text to enhance.
+    conn : Optional[HTTPSConnection]
+        A connection to the Gemini host to send the request over, reusing
+        it across calls saves the TCP and TLS handshakes, a connection
+        opened for lack of one is closed again (default: None).
     """
-    base = "https://generativelanguage.googleapis.com/v1beta/models"
-    url = f"{base}/{model}:generateContent?key={api_key}"
+    if conn is None:
+        from http.client import HTTPSConnection
+
+        conn = HTTPSConnection(c.GEMINI_HOST)
+        try:
+            return enhancer_gemini(model, persona_instr, api_key, text, conn)
+        finally:
+            conn.close()
+    url = f"/v1beta/models/{model}:generateContent?key={api_key}"
     headers = {
         "Content-Type": "application/json",
     }
@@ -65,19 +117,37 @@ def enhancer_gemini(
         },
         c.GEMINI_FLD_CONTENTS: {c.GEMINI_FLD_PARTS: {c.GEMINI_FLD_TEXT: text}},
     }
-    request = Request(
-        url, headers=headers, data=json.dumps(data).encode("utf-8")
-    )
-    with urlopen(request) as response:
-        data = json.loads(response.read())
-        return data[c.GEMINI_FLD_CANDIDATES][0][c.GEMINI_FLD_CONTENT][
-            c.GEMINI_FLD_PARTS
-        ][0][c.GEMINI_FLD_TEXT]
+    body = dump_json(data)
+    for attempt in range(2):
+        try:
+            conn.request("POST", url, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            break
+        except ConnectionError:
+            # the server may have closed an idle keep-alive connection,
+            # http.client reconnects on the next request after close()
+            conn.close()
+            if attempt:
+                raise
+        except Exception:
+            conn.close()
+            raise
+    if response.status != 200:
+        raise Exception(
+            f"gemini request failed: {response.status} {response.reason}"
+        )
+    data = json.loads(data)
+    return data[c.GEMINI_FLD_CANDIDATES][0][c.GEMINI_FLD_CONTENT][
+        c.GEMINI_FLD_PARTS
+    ][0][c.GEMINI_FLD_TEXT]
 
 
 def enhancer_groq(
     model: str, api_key: str, persona_instr: str, text: str
 ) -> str:
+    from urllib.request import Request, urlopen
+
     url = "https://api.groq.com/openai/v1/chat/completions"
     headers = {
         "Content-Type": "application/json",
@@ -92,7 +162,7 @@ def enhancer_groq(
         c.GROQ_FLD_MODEL: model,
     }
     with urlopen(
-        Request(url, headers=headers, data=json.dumps(data).encode("utf-8"))
+        Request(url, headers=headers, data=dump_json(data))
     ) as response:
         data = json.loads(response.read())
         return data[c.FLD_CHOICES][0][c.FLD_MESSAGE][c.FLD_CONTENT]
@@ -106,12 +176,36 @@ class BaseEnhancer(ABC):
     ----------
     enhance(text: str) -> str
         Enhances the given text.
+    enhance_many(texts: list[str], concurrency: int) -> list[str]
+        Enhances the given texts concurrently.
     """
 
     @abstractmethod
     def enhance(self, text: str) -> str:
         pass
 
+    def enhance_many(
+        self, texts: list[str], concurrency: int = 8
+    ) -> list[str]:
+        """
+        Enhances the given texts concurrently, the requests are bound by
+        network latency so they are sent from a pool of threads.
+
+        Parameters
+        ----------
+        texts : list[str]
+            The texts to enhance.
+        concurrency : int, optional
+            Maximum number of requests in flight at once (default: 8).
+
+        Returns
+        ----------
+        list of str
+            The enhanced texts, in the order of the given texts.
+        """
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(self.enhance, texts))
+
 
 class DefaultEnhancer(BaseEnhancer):
     """Enhances text using g4f (gpt for free)."""
@@ -133,13 +227,9 @@ class DefaultEnhancer(BaseEnhancer):
         gpt_model : str, optional
             The GPT model to be used for enhancement (default: gpt-3.5-turbo).
         """
-        if persona_instr is not None:
-            self.persona_instr = persona_instr
-        else:
-            assert (
-                persona in Persona
-            ), f"persona must be one of {', '.join(Persona)}"
-            self.persona_instr = c.persona_instrs[persona]
+        from g4f.client import Client
+
+        self.persona_instr = get_persona_instr(persona, persona_instr)
         self.model = gpt_model
         self.client = Client()
 
@@ -181,24 +271,25 @@ class GeminiEnhancer(BaseEnhancer):
             The GPT model to be used for enhancement if fallback_to_default
             is 'True'. (default: gpt-3.5-turbo).
         """
-        if persona_instr is not None:
-            self.persona_instr = persona_instr
-        else:
-            assert (
-                persona in Persona
-            ), f"persona must be one of {', '.join(Persona)}"
-            self.persona_instr = c.persona_instrs[persona]
+        self.persona_instr = get_persona_instr(persona, persona_instr)
         self.model = gemini_model.value
         self.api_key = api_key
+        # one keep-alive connection per thread, connections can't be shared
+        self.local = threading.local()
         self.default_enhancer = None
         self.fallback_to_gpt = fallback_to_default
         self.gpt_model = gpt_model
 
     def enhance(self, text: str) -> str:
         """Return text enhanced by Groq API."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            from http.client import HTTPSConnection
+
+            conn = self.local.conn = HTTPSConnection(c.GEMINI_HOST)
         try:
             return enhancer_gemini(
-                self.model, self.persona_instr, self.api_key, text
+                self.model, self.persona_instr, self.api_key, text, conn
             )
         except Exception:
             if self.fallback_to_gpt:
@@ -247,13 +338,7 @@ class GroqEnhancer(BaseEnhancer):
             The GPT model to be used for enhancement if fallback_to_default
             is 'True'. (default: gpt-3.5-turbo).
         """
-        if persona_instr is not None:
-            self.persona_instr = persona_instr
-        else:
-            assert (
-                persona in Persona
-            ), f"persona must be one of {', '.join(Persona)}"
-            self.persona_instr = c.persona_instrs[persona]
+        self.persona_instr = get_persona_instr(persona, persona_instr)
         self.model = groq_model
         self.api_key = api_key
         self.default_enhancer = None
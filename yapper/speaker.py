@@ -1,38 +1,95 @@
+import hashlib
+import json
 import os
+import queue
+import shutil
 import subprocess
+import tempfile
+import threading
+import wave
 from abc import ABC, abstractmethod
-from typing import Optional
-
-import pyttsx3 as tts
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
 import yapper.constants as c
 from yapper.enums import PiperQuality, PiperVoiceUK, PiperVoiceUS
+from yapper.synthesizer import OnnxSynthesizer
 from yapper.utils import (
     APP_DIR,
     PLATFORM,
     download_piper_model,
-    get_random_name,
-    install_piper
+    ensure_dir,
+    install_piper,
+    split_sentences,
+    trim_cache,
 )
 
-# suppresses pygame's welcome message
-os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
-import pygame  # noqa: E402
+if TYPE_CHECKING:
+    import pyaudio
+
+VOICE_ENUMS = (PiperVoiceUS, PiperVoiceUK)
+# members by value for each voice enum, kept apart so a name two enums
+# share is never silently resolved to one of them
+PIPER_VOICES = [{voice.value: voice for voice in enum} for enum in VOICE_ENUMS]
+PIPER_QUALITIES = {quality.value: quality for quality in PiperQuality}
+VOICE_ERROR = "voice must be a member of PiperVoiceUS or PiperVoiceUK"
+QUALITY_ERROR = "quality must be a member of PiperQuality"
+
+pa_instance = None
+pa_lock = threading.Lock()
+# pyttsx3 hands every caller the same engine and its run loop can only be
+# entered by one thread at a time
+tts_lock = threading.Lock()
+
+
+def find_voice(
+    voice: PiperVoiceUS | PiperVoiceUK | str,
+) -> PiperVoiceUS | PiperVoiceUK:
+    """
+    Returns the voice enum member for the given member or voice name.
+
+    Raises
+    ----------
+    ValueError
+        If the voice is unknown or its name is shared by several enums.
+    """
+    if isinstance(voice, VOICE_ENUMS):
+        return voice
+    if isinstance(voice, str):
+        matches = [voices[voice] for voices in PIPER_VOICES if voice in voices]
+        if len(matches) == 1:
+            return matches[0]
+    raise ValueError(VOICE_ERROR)
 
 
-def play_wave(wave_f: str):
+def find_quality(quality: PiperQuality | str) -> PiperQuality:
     """
-    Plays the given wave file using pygame.
+    Returns the quality enum member for the given member or quality name.
 
-    Parameters
+    Raises
     ----------
-    wave_f : str
-        The wave file to play.
+    ValueError
+        If the quality is unknown.
     """
-    sound = pygame.mixer.Sound(wave_f)
-    sound.play()
-    while pygame.mixer.get_busy():
-        pygame.time.wait(100)
+    if isinstance(quality, PiperQuality):
+        return quality
+    if isinstance(quality, str) and quality in PIPER_QUALITIES:
+        return PIPER_QUALITIES[quality]
+    raise ValueError(QUALITY_ERROR)
+
+
+def get_pa_instance() -> "pyaudio.PyAudio":
+    """
+    Returns the PyAudio instance shared by all speakers, PortAudio probes
+    every audio device when it is initialized so it is only done once.
+    """
+    global pa_instance
+    with pa_lock:
+        if pa_instance is None:
+            import pyaudio
+
+            pa_instance = pyaudio.PyAudio()
+    return pa_instance
 
 
 class BaseSpeaker(ABC):
@@ -69,25 +126,29 @@ class DefaultSpeaker(BaseSpeaker):
         volume : float, optional
             Volume of the sound generated, can be 0-1 (default: 1).
         """
-        assert voice in (
-            c.VOICE_MALE,
-            c.VOICE_FEMALE,
-        ), "unknown voice requested"
+        import pyttsx3 as tts
+
+        if voice not in (c.VOICE_MALE, c.VOICE_FEMALE):
+            raise ValueError("unknown voice requested")
         self.voice = voice
         self.rate = rate
         self.volume = volume
+        with tts_lock:
+            self.engine = tts.init()
+            self.voice_id = self.engine.getProperty("voices")[
+                int(voice == c.VOICE_FEMALE)
+            ].id
 
     def say(self, text: str):
         """Speaks the given text"""
-        engine = tts.init()
-        engine.setProperty("rate", self.rate)
-        engine.setProperty("volume", self.volume)
-        voice_id = engine.getProperty("voices")[
-            int(self.voice == c.VOICE_FEMALE)
-        ].id
-        engine.setProperty("voice", voice_id)
-        engine.say(text)
-        engine.runAndWait()
+        with tts_lock:
+            # the engine is shared by all speakers, so each one applies its
+            # own properties before speaking
+            self.engine.setProperty("rate", self.rate)
+            self.engine.setProperty("volume", self.volume)
+            self.engine.setProperty("voice", self.voice_id)
+            self.engine.say(text)
+            self.engine.runAndWait()
 
 
 class PiperSpeaker(BaseSpeaker):
@@ -128,6 +189,9 @@ class PiperSpeaker(BaseSpeaker):
         voice: PiperVoiceUS | PiperVoiceUK = PiperVoiceUS.HFC_FEMALE,
         quality: Optional[PiperQuality] = None,
         show_progress: bool = True,
+        max_cache_bytes: int = c.SPEECH_CACHE_BYTES,
+        in_process: bool = True,
+        check_updates: bool = False,
     ):
         """
         Parameters
@@ -141,12 +205,22 @@ class PiperSpeaker(BaseSpeaker):
             the given voice).
         show_progress : bool
             Show progress when the voice model is being downloaded (default: True).
+        max_cache_bytes : int, optional
+            Maximum size of the on-disk cache of synthesized sentences, the
+            least recently used sentences are evicted first, 0 disables the
+            cache (default: 64MB).
+        in_process : bool, optional
+            Synthesize speech in-process with onnxruntime instead of the
+            piper executable, used only if the 'onnx' extra (onnxruntime,
+            piper-phonemize and numpy) is installed (default: True).
+        check_updates : bool, optional
+            Check for an updated configuration of an already downloaded
+            voice, costs one small conditional request (default: False).
         """
-        assert isinstance(
-            voice, (PiperVoiceUS, PiperVoiceUK)
-        ), "voice must be a member of PiperVoiceUS or PiperVoiceUK"
-        quality = quality or PiperSpeaker.VOICE_QUALITY_MAP[voice]
-        assert quality in PiperQuality, "quality must a member of PiperQuality"
+        voice = find_voice(voice)
+        quality = find_quality(
+            quality or PiperSpeaker.VOICE_QUALITY_MAP[voice]
+        )
         install_piper(show_progress)
         self.exe_path = str(
             APP_DIR
@@ -154,10 +228,85 @@ class PiperSpeaker(BaseSpeaker):
             / ("piper.exe" if PLATFORM == c.PLATFORM_WINDOWS else "piper")
         )
         self.onnx_f, self.conf_f = download_piper_model(
-            voice, quality, show_progress
+            voice, quality, show_progress, refresh=check_updates
         )
         self.onnx_f, self.conf_f = str(self.onnx_f), str(self.conf_f)
-        pygame.mixer.init()
+        with open(self.conf_f, encoding="utf-8") as conf:
+            self.conf = json.load(conf)
+        # piper always produces 16-bit mono audio
+        self.sample_rate = self.conf["audio"]["sample_rate"]
+        self.channels = 1
+        self.sample_width = 2
+        self.pa_instance = get_pa_instance()
+        self.stream = self.pa_instance.open(
+            format=self.pa_instance.get_format_from_width(self.sample_width),
+            channels=self.channels,
+            rate=self.sample_rate,
+            output=True,
+            frames_per_buffer=c.FRAMES_PER_BUFFER,
+            start=False,
+        )
+        self.stream_lock = threading.Lock()
+        self.synthesizer = None
+        self.proc = None
+        if in_process:
+            try:
+                self.synthesizer = OnnxSynthesizer(self.onnx_f, self.conf)
+            except ImportError:
+                pass
+        if self.synthesizer is None:
+            self.lock = threading.Lock()
+            self.start_piper()
+        self.max_cache_bytes = max_cache_bytes
+        self.cache_dir = APP_DIR / "speech_cache"
+        ensure_dir(self.cache_dir)
+        # everything besides the text that changes the audio is part of the
+        # cache key, so a refreshed config or another synthesis backend
+        # never plays sentences cached before
+        backend = "piper" if self.synthesizer is None else "onnx"
+        conf = json.dumps(self.conf, sort_keys=True)
+        self.cache_salt = hashlib.blake2b(
+            f"{self.onnx_f}|{backend}|{conf}".encode("utf-8"), digest_size=16
+        ).hexdigest()
+
+    def start_piper(self):
+        """
+        Starts the piper process used for synthesis, it is kept running so
+        the voice model is loaded only once, it reads one json line per
+        utterance and prints the path of the wave file it wrote once the
+        utterance is synthesized.
+        """
+        self.wave_dir = Path(tempfile.mkdtemp(dir=APP_DIR))
+        self.proc = subprocess.Popen(
+            [
+                self.exe_path,
+                "-m",
+                self.onnx_f,
+                "-c",
+                self.conf_f,
+                "--json-input",
+                "--output_dir",
+                str(self.wave_dir),
+                "-q",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def stop_piper(self):
+        """Stops the piper process and removes its wave files."""
+        proc = getattr(self, "proc", None)
+        if proc is None:
+            return
+        self.proc = None
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(self.wave_dir, ignore_errors=True)
 
     def text_to_wave(self, text: str, file: str):
         """Saves the speech for the given text into the given file."""
@@ -177,12 +326,122 @@ class PiperSpeaker(BaseSpeaker):
             check=True,
         )
 
-    def say(self, text: str):
-        """Speaks the given text"""
-        f = APP_DIR / f"{get_random_name()}.wav"
+    def synthesize(self, text: str) -> bytes:
+        """
+        Returns the speech for the given text as raw PCM frames, from the
+        cache if the text has been synthesized before with this voice.
+        """
+        if not self.max_cache_bytes:
+            return self.text_to_frames(text)
+        key = hashlib.blake2b(
+            f"{self.cache_salt}|{text}".encode("utf-8"), digest_size=16
+        ).hexdigest()
+        cache_f = self.cache_dir / f"{key}.pcm"
+        try:
+            frames = cache_f.read_bytes()
+            # the modification time is used as the last-used time for
+            # eviction since access times are often not updated
+            os.utime(cache_f)
+            return frames
+        except FileNotFoundError:
+            pass
+        frames = self.text_to_frames(text)
+        fd, part_f = tempfile.mkstemp(suffix=".part", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(frames)
+            os.replace(part_f, cache_f)
+        except BaseException:
+            Path(part_f).unlink(missing_ok=True)
+            raise
+        trim_cache(self.cache_dir, self.max_cache_bytes)
+        return frames
+
+    def text_to_frames(self, text: str) -> bytes:
+        """
+        Synthesizes the given text in-process or using the running piper
+        process and returns the speech as raw PCM frames.
+        """
+        if self.synthesizer is not None:
+            return self.synthesizer.synthesize(text)
+        line = (json.dumps({"text": text}) + "\n").encode("utf-8")
+        with self.lock:
+            wave_f = self.request_wave(line)
         try:
-            self.text_to_wave(text, str(f))
-            play_wave(str(f))
+            with wave.open(wave_f, "rb") as wf:
+                return wf.readframes(wf.getnframes())
         finally:
-            if f.exists():
-                os.remove(f)
+            if os.path.exists(wave_f):
+                os.remove(wave_f)
+
+    def request_wave(self, line: bytes) -> str:
+        """
+        Sends the given json line to the piper process and returns the path
+        of the wave file it wrote, a piper process that has exited is
+        restarted and the line is sent again once.
+        """
+        for attempt in range(2):
+            if attempt or self.proc.poll() is not None:
+                self.stop_piper()
+                self.start_piper()
+            try:
+                self.proc.stdin.write(line)
+                self.proc.stdin.flush()
+                wave_f = self.proc.stdout.readline().decode("utf-8").strip()
+            except BrokenPipeError:
+                wave_f = ""
+            if wave_f:
+                return wave_f
+        raise Exception("piper exited unexpectedly")
+
+    def say(self, text: str):
+        """
+        Speaks the given text, the text is synthesized one sentence at a
+        time so that a sentence plays while the next one is synthesized.
+        """
+        sentences = split_sentences(text)
+        chunks = queue.Queue(maxsize=2)
+        done = threading.Event()
+
+        def produce():
+            try:
+                for sentence in sentences:
+                    if done.is_set():
+                        break
+                    chunks.put(self.synthesize(sentence))
+                chunks.put(None)
+            except Exception as e:
+                chunks.put(e)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        with self.stream_lock:
+            self.stream.start_stream()
+            try:
+                while (frames := chunks.get()) is not None:
+                    if isinstance(frames, Exception):
+                        raise frames
+                    self.stream.write(frames)
+            finally:
+                self.stream.stop_stream()
+                done.set()
+                # unblocks the producer if it is waiting on a full queue
+                while producer.is_alive():
+                    try:
+                        chunks.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+
+    def close(self):
+        """
+        Stops the piper process, removes its wave files and closes the
+        output stream.
+        """
+        self.stop_piper()
+        stream = getattr(self, "stream", None)
+        if stream is not None:
+            self.stream = None
+            stream.close()
+
+    def __del__(self):
+        self.close()
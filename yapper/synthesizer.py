@@ -0,0 +1,111 @@
+import yapper.constants as c
+from yapper.utils import PLATFORM, WORKERS
+
+PAD = "_"
+BOS = "^"
+EOS = "$"
+
+# hardware execution providers tried before the CPU, per platform
+PLATFORM_PROVIDERS = {
+    c.PLATFORM_LINUX: ["CUDAExecutionProvider"],
+    c.PLATFORM_MAC: ["CoreMLExecutionProvider"],
+    c.PLATFORM_WINDOWS: ["DmlExecutionProvider"],
+}
+
+
+class OnnxSynthesizer:
+    """
+    Synthesizes speech with a piper voice model in-process using
+    onnxruntime and piper-phonemize, the model is loaded and optimized
+    once and reused for every call.
+    """
+
+    def __init__(self, onnx_f: str, conf: dict):
+        """
+        Parameters
+        ----------
+        onnx_f : str
+            The piper voice model file.
+        conf : dict
+            The parsed piper voice configuration.
+
+        Raises
+        ----------
+        ImportError
+            If onnxruntime, piper-phonemize or numpy is not installed.
+        """
+        import numpy as np
+        import onnxruntime as ort
+        import piper_phonemize
+
+        self.np = np
+        self.phonemizer = piper_phonemize
+        self.conf = conf
+        self.id_map = conf["phoneme_id_map"]
+        self.espeak_voice = conf.get("espeak", {}).get("voice", "en-us")
+        self.phoneme_type = conf.get("phoneme_type", "espeak")
+        inference = conf.get("inference", {})
+        self.scales = np.array(
+            [
+                inference.get("noise_scale", 0.667),
+                inference.get("length_scale", 1.0),
+                inference.get("noise_w", 0.8),
+            ],
+            dtype=np.float32,
+        )
+        self.multi_speaker = conf.get("num_speakers", 1) > 1
+        silence = int(conf["audio"]["sample_rate"] * c.SENTENCE_SILENCE)
+        self.silence = bytes(2 * silence)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = (
+            ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        options.intra_op_num_threads = max(1, WORKERS // 2)
+        available = ort.get_available_providers()
+        providers = [
+            provider
+            for provider in PLATFORM_PROVIDERS.get(PLATFORM, [])
+            if provider in available
+        ]
+        providers.append("CPUExecutionProvider")
+        self.session = ort.InferenceSession(
+            onnx_f, options, providers=providers
+        )
+
+    def phonemize(self, text: str) -> list[list[str]]:
+        """Returns the phonemes of each sentence in the given text."""
+        if self.phoneme_type == "text":
+            return self.phonemizer.phonemize_codepoints(text)
+        return self.phonemizer.phonemize_espeak(text, self.espeak_voice)
+
+    def phonemes_to_ids(self, phonemes: list[str]) -> list[int]:
+        """Maps the given phonemes to the model's phoneme ids."""
+        ids = list(self.id_map[BOS])
+        for phoneme in phonemes:
+            if phoneme in self.id_map:
+                ids.extend(self.id_map[phoneme])
+                ids.extend(self.id_map[PAD])
+        ids.extend(self.id_map[EOS])
+        return ids
+
+    def synthesize(self, text: str) -> bytes:
+        """Returns the speech for the given text as 16-bit PCM frames."""
+        np = self.np
+        frames = []
+        for phonemes in self.phonemize(text):
+            ids = np.array([self.phonemes_to_ids(phonemes)], dtype=np.int64)
+            inputs = {
+                "input": ids,
+                "input_lengths": np.array([ids.shape[1]], dtype=np.int64),
+                "scales": self.scales,
+            }
+            if self.multi_speaker:
+                inputs["sid"] = np.array([0], dtype=np.int64)
+            audio = self.session.run(None, inputs)[0].squeeze()
+            # scale to the full 16-bit range the same way piper does
+            audio = audio * (32767 / max(0.01, float(np.max(np.abs(audio)))))
+            audio = np.clip(audio, -32767, 32767).astype(np.int16)
+            frames.append(audio.tobytes())
+            frames.append(self.silence)
+        return b"".join(frames)
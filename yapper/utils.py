@@ -1,37 +1,117 @@
+import contextlib
+import functools
+import io
 import os
 import platform
-import random
+import re
+import shutil
 import string
+import subprocess
 import sys
-import tarfile
-import zipfile
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from urllib.request import urlretrieve
+from typing import TYPE_CHECKING, BinaryIO, Iterator, Optional
 
 import yapper.constants as c
 import yapper.meta as meta
 from yapper.enums import PiperQuality, PiperVoiceUK, PiperVoiceUS
 
-PLATFORM = None
-APP_DIR = None
-
-if os.name == "nt":
-    PLATFORM = c.PLATFORM_WINDOWS
-    APP_DIR = Path(os.getenv("APPDATA"))
-elif os.name == "posix":
-    home = Path.home()
-    if os.uname().sysname == "Darwin":
-        PLATFORM = c.PLATFORM_MAC
-        APP_DIR = Path.home() / "Library/Application Support"
-    else:
-        PLATFORM = c.PLATFORM_LINUX
-        APP_DIR = Path.home() / ".config"
-else:
+# modules only needed to download and install are imported where they are
+# used, most processes find everything installed and never need them
+if TYPE_CHECKING:
+    import tarfile
+    from http.client import HTTPConnection, HTTPResponse
+
+
+@functools.cache
+def detect_platform() -> tuple[str, Path]:
+    """
+    Returns the current platform and the directory applications keep
+    their data in on it, the result is computed only once.
+    """
+    if os.name == "nt":
+        return c.PLATFORM_WINDOWS, Path(os.getenv("APPDATA"))
+    if os.name == "posix":
+        if os.uname().sysname == "Darwin":
+            return c.PLATFORM_MAC, Path.home() / "Library/Application Support"
+        return c.PLATFORM_LINUX, Path.home() / ".config"
     print("your system is not supported")
     sys.exit()
 
+
+ensured_dirs: set[Path] = set()
+
+
+def ensure_dir(path: Path):
+    """
+    Creates the given directory and its parents, directories this process
+    has already ensured are skipped without touching the filesystem.
+    """
+    if path in ensured_dirs:
+        return
+    path.mkdir(parents=True, exist_ok=True)
+    ensured_dirs.add(path)
+
+
+PLATFORM, APP_DIR = detect_platform()
+ARCH = platform.machine()
+# the CPUs this process may run on, which unlike os.cpu_count() respects
+# affinity masks and container CPU sets
+if hasattr(os, "sched_getaffinity"):
+    WORKERS = len(os.sched_getaffinity(0))
+else:
+    WORKERS = os.cpu_count() or 1
+
 APP_DIR = APP_DIR / meta.name
-APP_DIR.mkdir(exist_ok=True)
+ensure_dir(APP_DIR)
+
+
+@functools.cache
+def app_dir_entries() -> frozenset[str]:
+    """
+    Returns the names in the app's home directory, the directory is read
+    once per process so repeated existence checks cost no syscalls.
+    """
+    return frozenset(entry.name for entry in os.scandir(APP_DIR))
+
+
+PIPER_RELEASE = (
+    "https://github.com/rhasspy/piper/releases/download/2023.11.14-2"
+)
+# piper builds keyed by (platform, machine), None is the platform's default
+PIPER_BUILDS = {
+    (c.PLATFORM_LINUX, "aarch64"): "piper_linux_aarch64.tar.gz",
+    (c.PLATFORM_LINUX, "arm64"): "piper_linux_aarch64.tar.gz",
+    (c.PLATFORM_LINUX, "armv7l"): "piper_linux_armv7l.tar.gz",
+    (c.PLATFORM_LINUX, "armv7"): "piper_linux_armv7l.tar.gz",
+    (c.PLATFORM_LINUX, None): "piper_linux_x86_64.tar.gz",
+    (c.PLATFORM_WINDOWS, None): "piper_windows_amd64.zip",
+    (c.PLATFORM_MAC, None): "piper_macos_x64.tar.gz",
+}
+PIPER_URL = (
+    PIPER_RELEASE
+    + "/"
+    + (PIPER_BUILDS.get((PLATFORM, ARCH)) or PIPER_BUILDS[(PLATFORM, None)])
+)
+# the language code piper names the voices of each voice enum with
+LANG_CODES = {PiperVoiceUS: "en_US", PiperVoiceUK: "en_GB"}
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# maps every byte value to a letter, for turning random bytes into names
+NAME_ALPHABET = (string.ascii_letters * 5)[:256].encode()
+# whether stdout is a terminal, stdout is None under pythonw
+IS_TTY = sys.stdout is not None and sys.stdout.isatty()
+# the progress bar drawn for every width
+PROGRESS_BARS = ["\r|" + "=" * i + " " * (60 - i) + "|" for i in range(61)]
+
+REDIRECT_CODES = {301, 302, 303, 307, 308}
+# idle keep-alive connections by (scheme, host), downloads from a host
+# reuse them instead of paying for a new TCP and TLS handshake each
+idle_connections: dict[tuple[str, str], list["HTTPConnection"]] = {}
+idle_lock = threading.Lock()
 
 
 def get_random_name(length: int = 10) -> str:
@@ -43,15 +123,352 @@ def get_random_name(length: int = 10) -> str:
     length : int, optional
         Length of the random string (default: 10).
     """
-    return "".join(random.choices(string.ascii_letters, k=length))
+    return os.urandom(length).translate(NAME_ALPHABET).decode()
+
+
+def split_sentences(text: str) -> list[str]:
+    """
+    Splits the given text into sentences, keeping the punctuation at the
+    end of each sentence.
+
+    Parameters
+    ----------
+    text : str
+        The text to split.
+    """
+    return [s for s in SENTENCE_END.split(text.strip()) if s]
+
+
+def trim_cache(cache_dir: Path, max_bytes: int):
+    """
+    Deletes the least recently used files in the given directory until
+    their total size is at most 'max_bytes', '.part' files are only
+    deleted once they are older than SPEECH_CACHE_PART_AGE.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        The cache directory to trim.
+    max_bytes : int
+        The maximum total size of the files in the directory.
+    """
+    entries = []
+    total = 0
+    stale = time.time() - c.SPEECH_CACHE_PART_AGE
+    for entry in os.scandir(cache_dir):
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        if entry.name.endswith(".part"):
+            # other writers' files may still be being written
+            if stat.st_mtime < stale:
+                Path(entry.path).unlink(missing_ok=True)
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total += stat.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        Path(path).unlink(missing_ok=True)
+        total -= size
+
+
+class ProgressHook:
+    """
+    Shows download progress, the bar is only redrawn when it grows, at
+    most once every PROGRESS_INTERVAL seconds and when the download
+    completes.
+    """
+
+    def __init__(self):
+        self.last_width = -1
+        self.last_draw = 0.0
+
+    def __call__(self, block_idx: int, block_size: int, total_bytes: int):
+        part = min(((block_idx + 1) * block_size) / total_bytes, 1)
+        width = max(int(60 * part), 0)
+        if width == self.last_width:
+            return
+        now = time.monotonic()
+        if part < 1 and now - self.last_draw < c.PROGRESS_INTERVAL:
+            return
+        self.last_width, self.last_draw = width, now
+        sys.stdout.write(PROGRESS_BARS[width])
+        sys.stdout.flush()
+
+
+def get_connection(scheme: str, netloc: str) -> tuple["HTTPConnection", bool]:
+    """
+    Returns an idle connection to the given host from the pool or a new
+    one, along with whether it was reused.
+    """
+    with idle_lock:
+        idle = idle_connections.get((scheme, netloc))
+        if idle:
+            return idle.pop(), True
+    from http.client import HTTPConnection, HTTPSConnection
+
+    if scheme == "https":
+        return HTTPSConnection(netloc), False
+    return HTTPConnection(netloc), False
+
+
+def release_connection(
+    scheme: str, netloc: str, conn: "HTTPConnection", response: "HTTPResponse"
+):
+    """
+    Returns the given connection to the pool if the given response on it
+    was read completely and the server keeps it open, closes it otherwise.
+    """
+    if response.isclosed() and not response.will_close:
+        with idle_lock:
+            idle_connections.setdefault((scheme, netloc), []).append(conn)
+    else:
+        conn.close()
+
+
+def request_url(
+    scheme: str, netloc: str, path: str, headers: dict[str, str]
+) -> tuple["HTTPConnection", "HTTPResponse"]:
+    """
+    Sends a GET request over a pooled connection and returns the
+    connection with its response, a reused connection the server has
+    closed in the meantime is replaced by a new one.
+    """
+    while True:
+        conn, reused = get_connection(scheme, netloc)
+        try:
+            conn.request("GET", path, headers=headers)
+            return conn, conn.getresponse()
+        except ConnectionError:
+            conn.close()
+            if not reused:
+                raise
+        except BaseException:
+            conn.close()
+            raise
+
+
+@contextlib.contextmanager
+def open_url(
+    url: str, headers: Optional[dict[str, str]] = None
+) -> Iterator["HTTPResponse"]:
+    """
+    Requests the given URL and yields the response once its headers have
+    arrived, HTTP errors are raised before any content is read. Requests
+    share keep-alive connections per host and redirects are followed.
+
+    Parameters
+    ----------
+    url : str
+        The URL to request.
+    headers: dict of str, optional
+        Extra headers to send with the request.
+    """
+    from urllib.error import HTTPError
+    from urllib.parse import urljoin, urlsplit
+    from urllib.request import Request, getproxies, urlopen
+
+    # the artifacts are already compressed, don't ask for it again
+    headers = {
+        "Accept-Encoding": "identity",
+        "User-Agent": f"{meta.name}/{meta.version}",
+        **(headers or {}),
+    }
+    if getproxies():
+        # leave proxies and their authentication to urllib
+        with urlopen(Request(url, headers=headers)) as response:
+            yield response
+        return
+    for _ in range(c.MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        conn, response = request_url(parts.scheme, parts.netloc, path, headers)
+        location = response.getheader("Location")
+        if response.status not in REDIRECT_CODES or location is None:
+            break
+        # github and huggingface redirect downloads to their CDNs
+        response.read()
+        release_connection(parts.scheme, parts.netloc, conn, response)
+        url = urljoin(url, location)
+    else:
+        raise HTTPError(
+            url, response.status, "too many redirects", response.headers, None
+        )
+    try:
+        if not 200 <= response.status < 300:
+            body = io.BytesIO(response.read())
+            raise HTTPError(
+                url, response.status, response.reason, response.headers, body
+            )
+        yield response
+    finally:
+        release_connection(parts.scheme, parts.netloc, conn, response)
+
+
+def copy_response(
+    response: "HTTPResponse",
+    f: BinaryIO,
+    show_progress: bool,
+) -> int:
+    """
+    Copies the content of the given response into the given binary file
+    object and returns the number of bytes copied, raises
+    ContentTooShortError if the response ends before the length it
+    announced.
+
+    Parameters
+    ----------
+    response : HTTPResponse
+        The response to read content from.
+    f : BinaryIO
+        The file object to write the response content into.
+    show_progress: bool, optional
+        Whether to show progress while copying.
+    """
+    # a progress bar redrawn with carriage returns is only noise in logs
+    hook = ProgressHook() if show_progress and IS_TTY else None
+    buffer = memoryview(bytearray(c.DOWNLOAD_CHUNK_SIZE))
+    total_bytes = int(response.headers.get("Content-Length", -1))
+    block_idx = 0
+    read_bytes = 0
+    while size := response.readinto(buffer):
+        # buffered files write everything they are given, raw ones may
+        # write only part of it, big chunks still skip the buffer's copy
+        f.write(buffer[:size])
+        read_bytes += size
+        if hook is not None:
+            hook(block_idx, c.DOWNLOAD_CHUNK_SIZE, total_bytes)
+        block_idx += 1
+    if hook is not None:
+        print("")
+    # a connection closed early just ends the content without an error
+    if read_bytes < total_bytes:
+        from urllib.error import ContentTooShortError
+
+        raise ContentTooShortError(
+            f"retrieval incomplete: got only {read_bytes} out of "
+            f"{total_bytes} bytes",
+            None,
+        )
+    return read_bytes
 
 
-def progress_hook(block_idx: int, block_size: int, total_bytes: int):
-    """Shows download progress."""
-    part = min(((block_idx + 1) * block_size) / total_bytes, 1)
-    progress = "=" * int(60 * part)
-    padding = " " * (60 - len(progress))
-    print("\r|" + progress + padding + "|", end="")
+@contextlib.contextmanager
+def file_lock(path: Path) -> Iterator[bool]:
+    """
+    Holds an exclusive lock on the given lock file, waiting for another
+    holder if needed, and yields whether it had to wait. The lock is
+    released by the operating system if its holder dies.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT)
+    try:
+        if os.name == "nt":
+            import msvcrt
+
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                waited = False
+            except OSError:
+                waited = True
+                while True:
+                    # LK_LOCK gives up after about 10 seconds of retrying
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        pass
+            try:
+                yield waited
+            finally:
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                waited = False
+            except BlockingIOError:
+                waited = True
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield waited
+    finally:
+        os.close(fd)
+
+
+def save_response(
+    response: "HTTPResponse", file: Path, show_progress: bool
+) -> bool:
+    """
+    Saves the content of the given response into the given file, the
+    content is written to '<file>.part' that is moved into place once
+    complete, and its expected size is recorded in '<file>.size'.
+    Returns False without reading the response if another writer saved
+    the file in the meantime.
+    """
+    temp = file.with_name(file.name + ".part")
+    # the part is only written while holding '<file>.lock', so concurrent
+    # downloads of a file never share it and a part left behind by a
+    # killed process is simply overwritten by the next attempt
+    with file_lock(file.with_name(file.name + ".lock")) as waited:
+        if waited and is_downloaded(file):
+            # the writer that was waited for saved the file
+            return False
+        try:
+            with open(temp, "wb") as f:
+                size = copy_response(response, f, show_progress)
+            # copy_response raised if fewer bytes than announced arrived
+            size = int(response.headers.get("Content-Length", size))
+            size_file(file).write_text(f"{size}\n")
+            os.replace(temp, file)
+        except BaseException:
+            temp.unlink(missing_ok=True)
+            raise
+    return True
+
+
+def size_file(file: Path) -> Path:
+    """Returns the file the expected size of the given file is kept in."""
+    return file.with_name(file.name + ".size")
+
+
+def is_downloaded(file: Path) -> bool:
+    """
+    Checks whether the given file was downloaded completely, a file with
+    no recorded size is trusted as long as it exists.
+    """
+    try:
+        size = file.stat().st_size
+    except FileNotFoundError:
+        return False
+    try:
+        recorded = int(size_file(file).read_text())
+    except (OSError, ValueError):
+        return True
+    # comparing sizes catches truncation with a single stat
+    return recorded == size
+
+
+def download_to(url: str, f: BinaryIO, show_progress: bool):
+    """
+    Downloads the content from the given URL into the given binary file
+    object.
+
+    Parameters
+    ----------
+    url : str
+        The URL to download content from.
+    f : BinaryIO
+        The file object to write the URL content into.
+    show_progress: bool, optional
+        Whether to show progress while downloading.
+    """
+    with open_url(url) as response:
+        copy_response(response, f, show_progress)
 
 
 def download(url: str, file: str, show_progress: bool):
@@ -67,46 +484,204 @@ def download(url: str, file: str, show_progress: bool):
     show_progress: bool, optional
         Whether to show progress while downloading.
     """
-    hook = progress_hook if show_progress else None
-    urlretrieve(url, file, reporthook=hook)
-    if show_progress:
-        print("")
+    with open(file, "wb") as f:
+        download_to(url, f, show_progress)
+
+
+def download_if_missing(url: str, file: Path, show_progress: bool) -> bool:
+    """
+    Downloads the content from the given URL into the given file unless
+    it is already downloaded, nothing is written if the request fails.
+
+    Parameters
+    ----------
+    url : str
+        The URL to download content from.
+    file : Path
+        The file to save the URL content into.
+    show_progress: bool, optional
+        Whether to show progress while downloading.
+
+    Returns
+    ----------
+    bool
+        Whether the file was downloaded.
+    """
+    if is_downloaded(file):
+        return False
+    with open_url(url) as response:
+        return save_response(response, file, show_progress)
+
+
+def download_with_etag(url: str, file: Path, show_progress: bool) -> bool:
+    """
+    Downloads the content from the given URL into the given file, the
+    URL's ETag is kept next to the file and an existing file is only
+    downloaded again if the server reports that it has changed.
+
+    Parameters
+    ----------
+    url : str
+        The URL to download content from.
+    file : Path
+        The file to save the URL content into.
+    show_progress: bool, optional
+        Whether to show progress while downloading.
+
+    Returns
+    ----------
+    bool
+        Whether the file was downloaded.
+    """
+    from urllib.error import HTTPError
+
+    etag_file = file.with_name(file.name + ".etag")
+    headers = {}
+    if is_downloaded(file) and etag_file.exists():
+        headers["If-None-Match"] = etag_file.read_text().strip()
+    try:
+        with open_url(url, headers) as response:
+            if not save_response(response, file, show_progress):
+                return False
+            etag = response.headers.get("ETag")
+    except HTTPError as e:
+        if e.code == 304:
+            return False
+        raise
+    if etag:
+        etag_file.write_text(etag)
+    else:
+        etag_file.unlink(missing_ok=True)
+    return True
+
+
+def extract_tar(tar: "tarfile.TarFile", path: Path):
+    """
+    Extracts the given tar archive into the given directory, using the
+    'data' extraction filter where the python version has it.
+    """
+    import tarfile
+
+    if hasattr(tarfile, "data_filter"):
+        tar.extractall(path, filter="data")
+    else:
+        tar.extractall(path)
+
+
+def extract_tarball(archive: Path, path: Path):
+    """
+    Extracts the given gzipped tar archive into the given directory,
+    inflating it with ISA-L when isal is installed.
+    """
+    import tarfile
+
+    try:
+        from isal import igzip_threaded
+    except ImportError:
+        igzip_threaded = None
+
+    if igzip_threaded is not None:
+        # ISA-L inflates several times faster than zlib, reading uses at
+        # most one background thread which only helps with a spare CPU
+        threads = 1 if WORKERS > 1 else 0
+        with igzip_threaded.open(archive, "rb", threads=threads) as gz_f:
+            with tarfile.open(fileobj=gz_f, mode="r|") as z_f:
+                extract_tar(z_f, path)
+    else:
+        # streaming mode reads the archive once front to back instead of
+        # seeking around it
+        with open(archive, "rb", buffering=c.DOWNLOAD_CHUNK_SIZE) as f:
+            with tarfile.open(fileobj=f, mode="r|*") as z_f:
+                extract_tar(z_f, path)
+
+
+def extract_zip(archive: Path, path: Path):
+    """
+    Extracts the given zip archive into the given directory, using the
+    tar executable where it can read zip archives and python's zipfile
+    otherwise.
+    """
+    # windows 10 and later ship libarchive's bsdtar as tar, which
+    # extracts zip archives natively and much faster than zipfile
+    if shutil.which("tar"):
+        result = subprocess.run(
+            ["tar", "-xf", str(archive), "-C", str(path)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        if result.returncode == 0:
+            return
+    import zipfile
+
+    with zipfile.ZipFile(archive, "r") as z_f:
+        z_f.extractall(path)
 
 
 def install_piper(show_progress: bool):
     """Installs piper into the app's home directory."""
-    if (APP_DIR / "piper").exists():
+    if "piper" in app_dir_entries():
         return
-    zip_path = APP_DIR / "piper.zip"
+    # the listing may be stale, so the install is serialized across
+    # processes and checked again once the lock is held
+    with file_lock(APP_DIR / "piper.lock"):
+        app_dir_entries.cache_clear()
+        if "piper" in app_dir_entries():
+            return
+        try:
+            extract_piper(show_progress)
+        finally:
+            app_dir_entries.cache_clear()
+
+
+def extract_piper(show_progress: bool):
+    """Downloads piper and extracts it into the app's home directory."""
     if show_progress:
         print("installing piper...")
-    prefix = "https://github.com/rhasspy/piper/releases/download/2023.11.14-2"
-    if PLATFORM == c.PLATFORM_LINUX:
-        if platform.machine() in ("aarch64", "arm64"):
-            nix_link = f"{prefix}/piper_linux_aarch64.tar.gz"
-        elif platform.machine() in ("armv7l", "armv7"):
-            nix_link = f"{prefix}/piper_linux_armv7l.tar.gz"
+    # piper is extracted into a temporary directory and moved into place
+    # once complete, so an interrupted install is never mistaken for one
+    extract_dir = Path(tempfile.mkdtemp(dir=APP_DIR))
+    try:
+        if PLATFORM != c.PLATFORM_WINDOWS and shutil.which("tar"):
+            # the tar executable decompresses much faster than python's
+            # tarfile, and it extracts while the archive is downloading,
+            # it is only started once the request succeeded so a failed
+            # request doesn't also make tar complain about empty input
+            with open_url(PIPER_URL) as response:
+                tar = subprocess.Popen(
+                    ["tar", "-xzf", "-", "-C", str(extract_dir)],
+                    stdin=subprocess.PIPE,
+                )
+                # tar stops reading when it fails, its exit status then
+                # tells why instead of the broken pipe
+                try:
+                    copy_response(response, tar.stdin, show_progress)
+                except BrokenPipeError:
+                    pass
+                finally:
+                    try:
+                        tar.stdin.close()
+                    except BrokenPipeError:
+                        pass
+                    tar.wait()
+            if tar.returncode:
+                raise subprocess.CalledProcessError(tar.returncode, tar.args)
         else:
-            nix_link = f"{prefix}/piper_linux_x86_64.tar.gz"
-        download(nix_link, zip_path, show_progress)
-    elif PLATFORM == c.PLATFORM_WINDOWS:
-        download(f"{prefix}/piper_windows_amd64.zip", zip_path, show_progress)
-    else:
-        download(f"{prefix}/piper_macos_x64.tar.gz", zip_path, show_progress)
-
-    if PLATFORM == c.PLATFORM_WINDOWS:
-        with zipfile.ZipFile(zip_path, "r") as z_f:
-            z_f.extractall(APP_DIR)
-    else:
-        with tarfile.open(zip_path, "r") as z_f:
-            z_f.extractall(APP_DIR)
-    os.remove(zip_path)
+            archive = extract_dir / "piper_archive"
+            download(PIPER_URL, archive, show_progress)
+            if PLATFORM == c.PLATFORM_WINDOWS:
+                extract_zip(archive, extract_dir)
+            else:
+                extract_tarball(archive, extract_dir)
+        os.replace(extract_dir / "piper", APP_DIR / "piper")
+    finally:
+        shutil.rmtree(extract_dir, ignore_errors=True)
 
 
 def download_piper_model(
     voice: PiperVoiceUS | PiperVoiceUK,
     quality: PiperQuality,
     show_progress: bool,
+    refresh: bool = False,
 ) -> tuple[str, str]:
     """
     Downloads the given piper voice with the given quality.
@@ -117,6 +692,11 @@ def download_piper_model(
         The Piper voice model to download.
     quality : PiperQuality
         The quality of the given voice.
+    show_progress: bool
+        Whether to show progress while downloading.
+    refresh: bool, optional
+        Whether to check for an updated voice configuration even if it
+        is already downloaded (default: False).
 
     Returns
     ----------
@@ -124,8 +704,8 @@ def download_piper_model(
         The voice model file and the voice configuration file in a tuple.
     """
     voices_dir = APP_DIR / "piper_voices"
-    voices_dir.mkdir(exist_ok=True)
-    lang_code = "en_US" if isinstance(voice, PiperVoiceUS) else "en_GB"
+    ensure_dir(voices_dir)
+    lang_code = LANG_CODES[type(voice)]
     voice, quality = voice.value, quality.value
 
     onnx_file = voices_dir / f"{lang_code}-{voice}-{quality}.onnx"
@@ -135,28 +715,39 @@ def download_piper_model(
     prefix += lang_code
     help_url = "https://huggingface.co/rhasspy/piper-voices/tree/main/en/"
     help_url += lang_code
-    if not onnx_file.exists():
-        try:
-            if show_progress:
-                print(f"downloading requirements for {voice}...")
-            onnx_url = (
-                f"{prefix}/{voice}/{quality}/{onnx_file.name}?download=true"
+    onnx_url = f"{prefix}/{voice}/{quality}/{onnx_file.name}?download=true"
+    conf_url = f"{prefix}/{voice}/{quality}/{conf_file.name}?download=true"
+    # only the model is big enough to be worth a progress bar, the config
+    # is small enough to be revalidated with a conditional request
+    fetch_onnx = not is_downloaded(onnx_file)
+    fetch_conf = refresh or not is_downloaded(conf_file)
+    if not (fetch_onnx or fetch_conf):
+        return str(onnx_file), str(conf_file)
+    if show_progress and not (
+        is_downloaded(onnx_file) and is_downloaded(conf_file)
+    ):
+        print(f"downloading requirements for {voice}...")
+
+    # the config is fetched on a worker so its round trips hide behind the
+    # model download, the model is downloaded on the calling thread so an
+    # interrupt stops it and discards the partial file
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        conf_future = None
+        if fetch_conf:
+            conf_future = executor.submit(
+                download_with_etag, conf_url, conf_file, False
             )
-            download(onnx_url, onnx_file, show_progress)
-        except (KeyboardInterrupt, Exception) as e:
-            onnx_file.unlink(missing_ok=True)
+        try:
+            if fetch_onnx:
+                download_if_missing(onnx_url, onnx_file, show_progress)
+            if conf_future is not None:
+                conf_future.result()
+        except Exception as e:
             if getattr(e, "status", None) == 404:
                 raise Exception(
-                    f"{voice}({quality}) is not available, please refer to"
-                    f" {help_url} to check all available models"
+                    f"{voice}({quality}) is not available, please refer"
+                    f" to {help_url} to check all available models"
                 )
             raise e
-    if not conf_file.exists():
-        conf_url = f"{prefix}/{voice}/{quality}/{conf_file.name}?download=true"
-        try:
-            download(conf_url, conf_file, show_progress)
-        except (KeyboardInterrupt, Exception) as e:
-            conf_file.unlink(missing_ok=True)
-            raise e
 
     return str(onnx_file), str(conf_file)